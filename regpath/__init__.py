@@ -4,10 +4,12 @@ Home to RegistryPath and friends
 
 from __future__ import annotations
 
-import contextlib
+import ctypes
 import functools
+import re
 import typing
 import winreg
+from ctypes import wintypes
 
 __version__ = "0.0.1"
 
@@ -25,10 +27,389 @@ REGISTRY_KEYS = {
     "HKEY_CURRENT_CONFIG": winreg.HKEY_CURRENT_CONFIG,
 }
 
+# also holds common lower/title case spellings so most lookups are a single
+# dict probe without having to allocate an uppercased copy of the component
+_REGISTRY_KEYS_CI = dict(REGISTRY_KEYS)
+_REGISTRY_KEYS_CI.update({k.lower(): v for k, v in REGISTRY_KEYS.items()})
+_REGISTRY_KEYS_CI.update({k.title(): v for k, v in REGISTRY_KEYS.items()})
+
+# every valid HKEY constant... a tiny int set for validating an already-resolved key
+_HKEY_VALUES = frozenset(REGISTRY_KEYS.values())
+
+
+@functools.cache
+def _resolve_hkey(first_component: str) -> int | None:
+    """
+    Resolves a path's first component to its HKEY constant (or None if it isn't one)
+
+    In practice only a handful of spellings are ever seen, so the memoization makes
+    this a single dict probe per construction.
+    """
+    key = _REGISTRY_KEYS_CI.get(first_component)
+    if key is None:
+        # mixed case spellings (like HkLm) fall back to an uppercase probe
+        key = REGISTRY_KEYS.get(first_component.upper())
+    return key
+
+
+advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+
+_ERROR_FILE_NOT_FOUND = 2
+_ERROR_MORE_DATA = 234
+_ERROR_NO_MORE_ITEMS = 259
+
+# max lengths (in chars, including the null) for key/value names per the win32 docs
+_MAX_KEY_NAME_LEN = 256
+_MAX_VALUE_NAME_LEN = 16384
+
+
+class _VALENT(ctypes.Structure):
+    """
+    Mirrors the Win32 VALENTW structure used by RegQueryMultipleValuesW
+    """
+
+    _fields_ = [
+        ("ve_valuename", wintypes.LPWSTR),
+        ("ve_valuelen", wintypes.DWORD),
+        ("ve_valueptr", ctypes.c_size_t),
+        ("ve_type", wintypes.DWORD),
+    ]
+
+
+advapi32.RegQueryMultipleValuesW.argtypes = [
+    wintypes.HKEY,
+    ctypes.POINTER(_VALENT),
+    wintypes.DWORD,
+    wintypes.LPWSTR,
+    wintypes.LPDWORD,
+]
+advapi32.RegQueryMultipleValuesW.restype = wintypes.LONG
+
+advapi32.RegEnumKeyExW.argtypes = [
+    wintypes.HKEY,
+    wintypes.DWORD,
+    wintypes.LPWSTR,
+    wintypes.LPDWORD,
+    wintypes.LPDWORD,
+    wintypes.LPWSTR,
+    wintypes.LPDWORD,
+    ctypes.POINTER(wintypes.FILETIME),
+]
+advapi32.RegEnumKeyExW.restype = wintypes.LONG
+
+advapi32.RegEnumValueW.argtypes = [
+    wintypes.HKEY,
+    wintypes.DWORD,
+    wintypes.LPWSTR,
+    wintypes.LPDWORD,
+    wintypes.LPDWORD,
+    wintypes.LPDWORD,
+    wintypes.LPBYTE,
+    wintypes.LPDWORD,
+]
+advapi32.RegEnumValueW.restype = wintypes.LONG
+
+advapi32.RegQueryValueExW.argtypes = [
+    wintypes.HKEY,
+    wintypes.LPCWSTR,
+    wintypes.LPDWORD,
+    wintypes.LPDWORD,
+    wintypes.LPBYTE,
+    wintypes.LPDWORD,
+]
+advapi32.RegQueryValueExW.restype = wintypes.LONG
+
+
+def _query_value_type(handle: winreg.HKEYType, value_name: str) -> int | None:
+    """
+    Returns the registry type for the given value name on an open key handle
+    without copying any of its data out.
+
+    Returns None if the value doesn't exist.
+    """
+    typ = wintypes.DWORD(0)
+    status = advapi32.RegQueryValueExW(
+        int(handle), value_name, None, ctypes.byref(typ), None, None
+    )
+    if status == _ERROR_FILE_NOT_FOUND:
+        return None
+
+    if status not in (0, _ERROR_MORE_DATA):
+        raise ctypes.WinError(status)
+
+    return typ.value
+
+
+def _enum_key_names(handle: winreg.HKEYType) -> list[str]:
+    """
+    Returns the names of all subkeys under the given open key handle.
+
+    Calls RegEnumKeyExW directly with one reused name buffer instead of letting
+    winreg.EnumKey allocate a fresh buffer for every subkey.
+    """
+    names = []
+    name_buf = ctypes.create_unicode_buffer(_MAX_KEY_NAME_LEN)
+    name_len = wintypes.DWORD(0)
+    index = 0
+    while True:
+        name_len.value = _MAX_KEY_NAME_LEN
+        status = advapi32.RegEnumKeyExW(
+            int(handle), index, name_buf, ctypes.byref(name_len), None, None, None, None
+        )
+        if status == _ERROR_NO_MORE_ITEMS:
+            break
+
+        if status != 0:
+            raise ctypes.WinError(status)
+
+        names.append(name_buf.value)
+        index += 1
+    return names
+
+
+def _enum_value_names(handle: winreg.HKEYType) -> list[str]:
+    """
+    Returns the names of all values under the given open key handle.
+
+    Same reused-buffer idea as _enum_key_names, though via RegEnumValueW.
+    """
+    names = []
+    name_buf = ctypes.create_unicode_buffer(_MAX_VALUE_NAME_LEN)
+    name_len = wintypes.DWORD(0)
+    index = 0
+    while True:
+        name_len.value = _MAX_VALUE_NAME_LEN
+        status = advapi32.RegEnumValueW(
+            int(handle), index, name_buf, ctypes.byref(name_len), None, None, None, None
+        )
+        if status == _ERROR_NO_MORE_ITEMS:
+            break
+
+        if status != 0:
+            raise ctypes.WinError(status)
+
+        names.append(name_buf.value)
+        index += 1
+    return names
+
+
+def _query_multiple_values(
+    handle: winreg.HKEYType, value_names: list[str]
+) -> dict[str, tuple[bytes, int]]:
+    """
+    Reads all of the given value names from an open key handle in one
+    RegQueryMultipleValuesW call.
+
+    Returns a dict of value name -> (raw data bytes, registry type).
+    """
+    if not value_names:
+        return {}
+
+    valents = (_VALENT * len(value_names))()
+    # keep the name buffers alive for the duration of both calls
+    name_bufs = [ctypes.create_unicode_buffer(name) for name in value_names]
+    for valent, name_buf in zip(valents, name_bufs):
+        valent.ve_valuename = ctypes.cast(name_buf, wintypes.LPWSTR)
+
+    # probe with no buffer to learn the total size needed
+    total_size = wintypes.DWORD(0)
+    status = advapi32.RegQueryMultipleValuesW(
+        int(handle), valents, len(value_names), None, ctypes.byref(total_size)
+    )
+    if status not in (0, _ERROR_MORE_DATA):
+        raise ctypes.WinError(status)
+
+    data_buf = ctypes.create_string_buffer(total_size.value)
+    status = advapi32.RegQueryMultipleValuesW(
+        int(handle),
+        valents,
+        len(value_names),
+        ctypes.cast(data_buf, wintypes.LPWSTR),
+        ctypes.byref(total_size),
+    )
+    if status != 0:
+        raise ctypes.WinError(status)
+
+    base_address = ctypes.addressof(data_buf)
+    ret_dict = {}
+    for name, valent in zip(value_names, valents):
+        offset = valent.ve_valueptr - base_address
+        ret_dict[name] = (
+            data_buf.raw[offset : offset + valent.ve_valuelen],
+            valent.ve_type,
+        )
+    return ret_dict
+
+
+def _reg_bytes_to_py(data: bytes, typ: int) -> typing.Any:
+    """
+    Converts raw registry value bytes to a Python object roughly the same way
+    winreg.QueryValueEx would
+    """
+    if typ in (winreg.REG_SZ, winreg.REG_EXPAND_SZ):
+        return data.decode("utf-16-le").rstrip("\x00")
+
+    if typ == winreg.REG_MULTI_SZ:
+        return [s for s in data.decode("utf-16-le").split("\x00") if s]
+
+    if typ in (winreg.REG_DWORD, winreg.REG_QWORD):
+        return int.from_bytes(data, "little")
+
+    if typ == winreg.REG_DWORD_BIG_ENDIAN:
+        return int.from_bytes(data, "big")
+
+    # REG_BINARY and friends... winreg gives None for empty data here
+    return data or None
+
+
+# something like %SystemRoot%... stops scanning at the first hit instead of
+# counting every % in the string
+_ENV_RE = re.compile(r"%[^%\s]+%")
+
+
+def _guess_str_registry_type(value: str) -> int:
+    if _ENV_RE.search(value):
+        # .. possibly detected env vars
+        return winreg.REG_EXPAND_SZ
+    return winreg.REG_SZ
+
+
+def _guess_int_registry_type(value: int) -> int:
+    if value < 0:
+        raise ValueError(
+            "Guessed an integer type.. but you passed a negative. Numbers in the registry are unsigned."
+        )
+
+    if value > 0xFFFFFFFF:
+        return winreg.REG_QWORD
+    return winreg.REG_DWORD
+
+
+# maps a value's exact type to something that can guess its registry type...
+# a single dict probe instead of a chain of isinstance calls
+_TYPE_GUESS = {
+    str: _guess_str_registry_type,
+    int: _guess_int_registry_type,
+    bool: _guess_int_registry_type,
+    # if someone does like a list of ints... this will break
+    list: lambda value: winreg.REG_MULTI_SZ,
+    type(None): lambda value: winreg.REG_NONE,
+    bytes: lambda value: winreg.REG_BINARY,
+}
+
+
+def _guess_registry_type(value: typing.Any) -> int:
+    """
+    Guesses the registry type for the given value based on its Python type.
+
+    Unknown types default to binary data.
+    """
+    guesser = _TYPE_GUESS.get(type(value))
+    if guesser is None:
+        return winreg.REG_BINARY
+    return guesser(value)
+
+
+# repr format keyed by (value_name is None, computer is None)... one dict probe
+# and one format call instead of branching and concatenating
+_REPR_FMT = {
+    (True, True): "<RegistryPath: {p}>",
+    (False, True): "<RegistryPath: {p} -> {v}>",
+    (True, False): "<RegistryPath: {p} On {c}>",
+    (False, False): "<RegistryPath: {p} -> {v} On {c}>",
+}
+
+
+# cache of open registry handles keyed by (computer, hkey, subkey, access mask).
+# opening a handle costs a ConnectRegistry + OpenKey round trip, so repeated
+# operations on the same path reuse one already-open handle instead.
+_handle_cache: dict[tuple, winreg.HKEYType] = {}
+
+
+@functools.cache
+def _root(computer: str | None, hive: int) -> winreg.HKEYType:
+    """
+    Returns the (cached) root handle for the given computer/hive.
+
+    Root handles live for the life of the process (much like the HKEY constants
+    themselves) so there's no need to reconnect per operation.
+    """
+    return winreg.ConnectRegistry(computer, hive)
+
+
+def clear_handle_cache() -> None:
+    """
+    Closes and forgets all cached registry handles (and any cached exists() answers)
+    """
+    while _handle_cache:
+        _, handle = _handle_cache.popitem()
+        winreg.CloseKey(handle)
+
+    _root.cache_clear()
+    _probe_cache.clear()
+
+
+def _rmtree_with_handle(handle: winreg.HKEYType) -> None:
+    """
+    Deletes all subkeys and values under the given open (read+write) key handle.
+
+    Recurses using handles opened relative to the given one, so no full path ever
+    has to be re-opened from the root. Always enumerates index 0 since each
+    deletion shifts the remaining entries down.
+    """
+    while True:
+        try:
+            sub_key_name = winreg.EnumKey(handle, 0)
+        except OSError:
+            # no more subkeys
+            break
+
+        with winreg.OpenKey(
+            handle, sub_key_name, access=winreg.KEY_READ | winreg.KEY_WRITE
+        ) as child_handle:
+            _rmtree_with_handle(child_handle)
+        winreg.DeleteKey(handle, sub_key_name)
+
+    while True:
+        try:
+            value_name = winreg.EnumValue(handle, 0)[0]
+        except OSError:
+            # no more values
+            break
+
+        winreg.DeleteValue(handle, value_name)
+
+
+# remembers whether a path existed the last time exists() probed for it. any
+# write/remove that goes through this module clears it since that can change
+# what exists.
+_probe_cache: dict[tuple, bool] = {}
+
+
+class _CachedHandle:
+    """
+    Context manager that yields an already-open registry handle.
+
+    Exiting is a no-op: the handle stays open in the cache so it can be reused.
+    """
+
+    __slots__ = ("handle",)
+
+    def __init__(self, handle: winreg.HKEYType):
+        self.handle = handle
+
+    def __enter__(self) -> winreg.HKEYType:
+        return self.handle
+
+    def __exit__(self, *args) -> None:
+        pass
+
 
 class HKeyNotFoundError(FileNotFoundError):
     """Denotes that we couldn't find the HKEY constant for this path"""
 
+    __slots__ = ("path",)
+
     def __init__(self, path: RegistryPath):
         self.path = path
 
@@ -37,6 +418,24 @@ class HKeyNotFoundError(FileNotFoundError):
 
 
 class RegistryPath:
+    # iterating big keys creates a lot of these, so keep instances slotted...
+    # __dict__ stays so runtime attribute assignment (like test monkey-patching)
+    # still works, though it's only materialized for instances that need it
+    __slots__ = (
+        "_raw_path",
+        "computer",
+        "value_name",
+        "_key",
+        "_key_raw",
+        "_split_parts",
+        "_parts",
+        "_subkey",
+        "_name",
+        "_key_tuple",
+        "_parents",
+        "__dict__",
+    )
+
     def __init__(
         self, raw_path: str, value_name: str | None = None, computer: str | None = None
     ):
@@ -56,37 +455,54 @@ class RegistryPath:
                 "The given raw registry path must be a string and longer than one character"
             )
 
-        # get rid of computer from the front of a registry path
-        if raw_path.lower().startswith("computer"):
-            raw_path = raw_path[len("computer") + 1 :]
+        # get rid of computer from the front of a registry path...
+        # only lowercase the first 8 chars instead of copying the whole path
+        if raw_path[:8].lower() == "computer":
+            raw_path = raw_path[9:]
 
         self._raw_path = raw_path
-        self._parse_raw_path(self._path_split())
+
+        # only the first component is needed to find the HKEY and everything after
+        # the first backslash is the subkey... partition hands us both without
+        # building (or joining) any lists
+        first_component, _, subkey_str = raw_path.partition("\\")
+        key = _resolve_hkey(first_component)
+        if key is None:
+            raise HKeyNotFoundError(self)
+
+        self._key = key
+        self._key_raw = first_component
+        self._subkey = subkey_str
+
+        # these are all trivially cheap, so compute them once up front instead of
+        # caching lazily on each property. keys (the common case) share one tuple
+        # between _split_parts and _parts.
+        self._split_parts = tuple(raw_path.split("\\"))
+        if value_name is not None:
+            self._parts = self._split_parts + (value_name,)
+        else:
+            self._parts = self._split_parts
+        self._name = value_name if value_name is not None else self._split_parts[-1]
+        self._key_tuple = (key, subkey_str, value_name, computer)
+        self._parents = None
 
     def __repr__(self) -> str:
         """
         Returns a representation of the object
         """
-        if self.value_name is None:
-            ret = f"<RegistryPath: {self._raw_path}"
-        else:
-            ret = f"<RegistryPath: {self._raw_path} -> {self.value_name}"
-
-        if self.computer is not None:
-            ret += f" On {self.computer}"
-
-        ret += ">"
-        return ret
+        return _REPR_FMT[(self.value_name is None, self.computer is None)].format(
+            p=self._raw_path, v=self.value_name, c=self.computer
+        )
 
     def __hash__(self) -> int:
         """
         Returns a unique hash for this object
         """
-        return hash(repr(self))
+        return hash(self._key_tuple)
 
     def __eq__(self, other) -> bool:
         """Returns True if both are equal"""
-        return hash(self) == hash(other)
+        return isinstance(other, RegistryPath) and self._key_tuple == other._key_tuple
 
     def __truediv__(self, other: str):
         """
@@ -98,45 +514,62 @@ class RegistryPath:
                 "Cannot do <path to file/value name> <SLASH> something else"
             )
 
-        # value_name MUST be None
-        return RegistryPath(
-            "\\".join(self.parts) + "\\" + other, computer=self.computer
-        )
+        # value_name MUST be None, so the raw path IS the joined parts
+        return RegistryPath(self._raw_path + "\\" + other, computer=self.computer)
 
-    def _path_split(self) -> list[str]:
+    @classmethod
+    def _from_raw(
+        cls,
+        raw_path: str,
+        split_parts: tuple[str, ...],
+        key: int,
+        computer: str | None = None,
+    ) -> RegistryPath:
         """
-        Splits the path into a list of components
+        Fast constructor for key paths derived from an already-parsed RegistryPath.
 
-        We allow using the '/' operator BUT we can't split on that since registry keys can have / in them.
-        This explains why using / instead of \\ in paths will not work properly.
-        """
-        return self._raw_path.split("\\")
-
-    def _parse_raw_path(self, path_components: list[str] | None) -> None:
+        Skips the parsing/validation work done by __init__ since the caller already
+        knows the HKEY and components for this raw path.
         """
-        Sets self._key from the given path components.
-        Will raise if the inital HKey is not valid.
-        """
-        first_component = path_components[0]
+        self = cls.__new__(cls)
+        self.computer = computer
+        self.value_name = None
+        self._raw_path = raw_path
+        self._split_parts = split_parts
 
-        if first_component.upper() in REGISTRY_KEYS:
-            key_raw = path_components[0]
-        else:
+        if key not in _HKEY_VALUES:
             raise HKeyNotFoundError(self)
 
-        self._key = REGISTRY_KEYS[key_raw]
+        self._key = key
+        self._key_raw = split_parts[0]
+        self._parts = split_parts
+        self._subkey = raw_path.partition("\\")[2]
+        self._name = split_parts[-1]
+        self._key_tuple = (key, self._subkey, None, computer)
+        self._parents = None
+        return self
+
+    def _path_split(self) -> list[str]:
+        """
+        Returns the path as a list of components
+
+        We allow using the '/' operator BUT we can't split on that since registry keys can have / in them.
+        This explains why using / instead of \\ in paths will not work properly.
+        """
+        return list(self._split_parts)
 
-    @contextlib.contextmanager
     def _get_subkey_handle(
         self, reads: bool = True, writes: bool = False
-    ) -> typing.Iterator[winreg.HKEYType]:
+    ) -> _CachedHandle:
         """
         Contextmanager to get a handle to the referenced subkey inside the registry on the given computer
 
         If reads is True, open with read access (default)
         If writes is True, open with write access
 
-        Will close the handle(s) out upon exit.
+        Handles are cached per (computer, key, subkey, access) and stay open upon
+        exit so they can be reused. Use close() or clear_handle_cache() to really
+        close them out.
         """
         access = 0
         if reads:
@@ -144,26 +577,62 @@ class RegistryPath:
         if writes:
             access |= winreg.KEY_WRITE
 
-        with winreg.ConnectRegistry(self.computer, self._key) as reg_handle:
+        cache_key = (self.computer, self._key, self.subkey, access)
+        handle = _handle_cache.get(cache_key)
+        if handle is None:
             # folder/key
-            with winreg.OpenKey(reg_handle, self.subkey, access=access) as handle:
-                yield handle
+            handle = winreg.OpenKey(
+                _root(self.computer, self._key), self.subkey, access=access
+            )
+            _handle_cache[cache_key] = handle
+
+        return _CachedHandle(handle)
+
+    def close(self, include_children: bool = False) -> None:
+        """
+        Closes any cached handles for this path (regardless of access)
+
+        If include_children is True, also closes cached handles for everything
+        below this path... needed when the whole subtree is going away.
+        """
+        prefix = (self.computer, self._key, self.subkey)
+        child_prefix = self.subkey + "\\" if self.subkey else ""
+        for cache_key in [
+            k
+            for k in _handle_cache
+            if k[:3] == prefix
+            or (
+                include_children
+                and k[:2] == prefix[:2]
+                and k[2].startswith(child_prefix)
+            )
+        ]:
+            winreg.CloseKey(_handle_cache.pop(cache_key))
 
     def exists(self) -> bool:
         """
         Returns True if the given path resolves to something (either a key or value)
+
+        The answer is cached until something is written/removed through this module,
+        so changes made behind our back may not be noticed right away.
         """
+        cached = _probe_cache.get(self._key_tuple)
+        if cached is not None:
+            return cached
+
         try:
             with self._get_subkey_handle() as handle:
-                if self.value_name is None:
-                    # dir/key and its there
-                    return True
-                else:
+                if self.value_name is not None:
                     # value name ... need to check for that.
                     winreg.QueryValueEx(handle, self.value_name)
-                    return True
+
+            # otherwise its a dir/key and its there
+            result = True
         except FileNotFoundError:
-            return False
+            result = False
+
+        _probe_cache[self._key_tuple] = result
+        return result
 
     def is_dir(self) -> bool:
         """
@@ -176,13 +645,10 @@ class RegistryPath:
         """
         Returns True if this path appears to be a value name/file
         """
-        vname = value_name or self.value_name
-        return (
-            vname is not None and self.with_value_name(value_name=value_name).exists()
-        )
+        vname = value_name if value_name is not None else self.value_name
+        return vname is not None and self.with_value_name(value_name=vname).exists()
 
     @property
-    @functools.lru_cache
     def parent(self) -> RegistryPath:
         """
         Returns the first parent of this path
@@ -190,42 +656,59 @@ class RegistryPath:
         return self.parents[0]
 
     @property
-    @functools.lru_cache
     def parents(self) -> tuple[RegistryPath]:
         """
         Returns a tuple of all parent parts of this RegistryPath
         """
+        if self._parents is not None:
+            return self._parents
+
         ret_list = []
-        for i in range(1, len(self.parts)):
-            ret_list.append(RegistryPath("\\".join(self.parts[:-i])))
-        return tuple(ret_list)
+
+        # for a value, the first parent is the key holding it
+        if self.value_name is not None:
+            ret_list.append(
+                RegistryPath._from_raw(
+                    self._raw_path, self._split_parts, self._key, self.computer
+                )
+            )
+
+        # walk the raw path from the right so each parent is a single slice
+        # instead of a re-join of the remaining components
+        end = len(self._raw_path)
+        keep = len(self._split_parts)
+        while True:
+            cut = self._raw_path.rfind("\\", 0, end)
+            if cut <= 0:
+                break
+
+            keep -= 1
+            ret_list.append(
+                RegistryPath._from_raw(
+                    self._raw_path[:cut],
+                    self._split_parts[:keep],
+                    self._key,
+                    self.computer,
+                )
+            )
+            end = cut
+
+        self._parents = tuple(ret_list)
+        return self._parents
 
     @property
-    @functools.lru_cache
     def name(self) -> str:
         """
         Returns the name of our key (if we're a dir/key) or the value_name if we're a value
         """
-
-        # if this is a key, return the key name
-        if self.value_name is None:
-            return self.parts[-1]
-
-        # if this is a value name, return that
-        return self.value_name
+        return self._name
 
     @property
-    @functools.lru_cache
     def subkey(self) -> str:
         """
         Returns the subkey (all dirs that lead to the final key skipping the first key)
         """
-        # if we have a value_name, parts will include the value name... skip that part
-        if self.value_name is not None:
-            return "\\".join(self.parts[1:-1])
-
-        # no value name, so just skip the HKEY
-        return "\\".join(self.parts[1:])
+        return self._subkey
 
     @property
     def registry_type(self) -> int:
@@ -244,15 +727,11 @@ class RegistryPath:
             return typ
 
     @property
-    @functools.lru_cache
     def parts(self) -> tuple[str]:
         """
         Returns a tuple of parts that make up this path
         """
-        ret_list = self._path_split()
-        if self.value_name is not None:
-            ret_list.append(self.value_name)
-        return tuple(ret_list)
+        return self._parts
 
     def mkdir(self, parents: bool = False, exist_ok: bool = False) -> None:
         """
@@ -281,6 +760,8 @@ class RegistryPath:
             with winreg.CreateKey(handle, self.name):
                 pass
 
+        _probe_cache.clear()
+
     def iterdir(self) -> typing.Generator[RegistryPath, None, None]:
         """
         Iterates over all the subkeys and values in this key
@@ -289,16 +770,48 @@ class RegistryPath:
             raise NotADirectoryError(f"{self} is not a key/directory")
 
         with self._get_subkey_handle() as handle:
-            num_sub_keys, num_values, _ = winreg.QueryInfoKey(handle)
-
-            for sub_key_idx in range(num_sub_keys):
-                sub_key_name = winreg.EnumKey(handle, sub_key_idx)
+            for sub_key_name in _enum_key_names(handle):
                 yield self / sub_key_name
 
-            for value_idx in range(num_values):
-                value_name, _, _ = winreg.EnumValue(handle, value_idx)
+            for value_name in _enum_value_names(handle):
                 yield self.with_value_name(value_name)
 
+    def iterdir_with_values(
+        self,
+    ) -> typing.Generator[tuple[RegistryPath, typing.Any], None, None]:
+        """
+        Like iterdir() though also yields the data for each value via one batched read.
+
+        Yields tuples of (path, None) for subkeys and (path, data) for values.
+        """
+        if not self.is_dir():
+            raise NotADirectoryError(f"{self} is not a key/directory")
+
+        with self._get_subkey_handle() as handle:
+            for sub_key_name in _enum_key_names(handle):
+                yield self / sub_key_name, None
+
+            value_names = _enum_value_names(handle)
+
+        for value_name, value in self.read_many(value_names).items():
+            yield self.with_value_name(value_name), value
+
+    def read_many(self, value_names: list[str]) -> dict[str, typing.Any]:
+        """
+        Reads all of the given value names from this key with one registry call.
+
+        Returns a dict of value name -> Python object. This is much faster than
+        calling read() once per value since all values come back in a single
+        round trip.
+        """
+        with self._get_subkey_handle() as handle:
+            raw_values = _query_multiple_values(handle, list(value_names))
+
+        return {
+            name: _reg_bytes_to_py(data, typ)
+            for name, (data, typ) in raw_values.items()
+        }
+
     def unlink(self, missing_ok: bool = False):
         """
         Removes the given value_name. From the current subkey
@@ -312,6 +825,8 @@ class RegistryPath:
             except FileNotFoundError:
                 if not missing_ok:
                     raise
+            finally:
+                _probe_cache.clear()
 
     def rmdir(self):
         """
@@ -322,20 +837,31 @@ class RegistryPath:
             raise OSError(f"The directory/key is not empty: {self}")
         except StopIteration:
             # this is ok.. it means the dir/key is empty... we can safely remove it.
+            self.close()
             with self.parent._get_subkey_handle(writes=True) as handle:
                 winreg.DeleteKey(handle, self.name)
 
+            _probe_cache.clear()
+
     def rmtree(self):
         """
         Recursively removes this directory/key and all its contents
         """
+        if not self.is_dir():
+            raise NotADirectoryError(f"{self} is not a key/directory")
 
-        for child in self.iterdir():
-            if child.is_dir():
-                child.rmtree()
-            else:
-                child.unlink()
-        self.rmdir()
+        # empty everything below us via one open handle per key instead of
+        # reopening each child from the root for is_dir/unlink/rmdir
+        with self._get_subkey_handle(writes=True) as handle:
+            _rmtree_with_handle(handle)
+
+        # descendants may have cached handles too... those keys are all about to
+        # be gone, so a stale open handle would make them look like they exist
+        self.close(include_children=True)
+        with self.parent._get_subkey_handle(writes=True) as handle:
+            winreg.DeleteKey(handle, self.name)
+
+        _probe_cache.clear()
 
     def with_value_name(self, value_name: str | None = None) -> RegistryPath:
         """
@@ -353,7 +879,7 @@ class RegistryPath:
 
         If value_name is None, will use the constructor's value_name instead. If that was also None, will raise ValueError
         """
-        vname = value_name or self.value_name
+        vname = value_name if value_name is not None else self.value_name
         if vname is None:
             raise ValueError("value_name must be provided to use read_raw()")
 
@@ -379,13 +905,15 @@ class RegistryPath:
         Write the given value of the given type into the registry at our current value_name.
         If value_name is not given, will use the one on this RegistryPath object.
         """
-        vname = value_name or self.value_name
+        vname = value_name if value_name is not None else self.value_name
         if vname is None:
             raise ValueError("value_name must be provided to use write_raw()")
 
         with self._get_subkey_handle(writes=True) as handle:
             winreg.SetValueEx(handle, vname, 0, typ, value)
 
+        _probe_cache.clear()
+
     def write(
         self, value: typing.Any, value_name: str | None = None, read_type: bool = True
     ):
@@ -403,44 +931,36 @@ class RegistryPath:
         If more control is needed over type, use write_raw()
         """
 
-        vname = value_name or self.value_name
+        vname = value_name if value_name is not None else self.value_name
         if vname is None:
             raise ValueError("value_name must be provided to use write()")
 
-        # default to binary data
-        typ = winreg.REG_BINARY
+        typ = None if read_type else _guess_registry_type(value)
 
-        guess_type = True
-        if read_type:
-            try:
-                typ = self.with_value_name(vname).registry_type
-                guess_type = False
-            except FileNotFoundError:
-                # can't read it if it doesn't exist... that's ok.. we'll guess
-                pass
+        # probe the type and set the value through the same handle instead of
+        # opening once for the type read and again for the write
+        with self._get_subkey_handle(writes=True) as handle:
+            if typ is None:
+                typ = _query_value_type(handle, vname)
+                if typ is None:
+                    # can't read it if it doesn't exist... that's ok.. we'll guess
+                    typ = _guess_registry_type(value)
+
+            winreg.SetValueEx(handle, vname, 0, typ, value)
+
+        _probe_cache.clear()
+
+    def write_many(self, values: dict[str, typing.Any]) -> None:
+        """
+        Writes all of the given value name -> value pairs to this key.
+
+        The key is opened once for the whole batch and types are guessed the same
+        way write(read_type=False) would.
+        """
+        with self._get_subkey_handle(writes=True) as handle:
+            for value_name, value in values.items():
+                winreg.SetValueEx(
+                    handle, value_name, 0, _guess_registry_type(value), value
+                )
 
-        if guess_type:
-            if isinstance(value, str):
-                percent_count = value.count("%")
-                if percent_count > 0 and percent_count % 2 == 0:
-                    # .. possibly detected env vars
-                    typ = winreg.REG_EXPAND_SZ
-                else:
-                    typ = winreg.REG_SZ
-            elif isinstance(value, list):
-                # if someone does like a list of ints... this will break
-                typ = winreg.REG_MULTI_SZ
-            elif isinstance(value, type(None)):
-                typ = winreg.REG_NONE
-            elif isinstance(value, int):
-                if value < 0:
-                    raise ValueError(
-                        "Guessed an integer type.. but you passed a negative. Numbers in the registry are unsigned."
-                    )
-
-                if value > 0xFFFFFFFF:
-                    typ = winreg.REG_QWORD
-                else:
-                    typ = winreg.REG_DWORD
-
-        self.write_raw(value, typ, vname)
+        _probe_cache.clear()
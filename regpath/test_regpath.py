@@ -3,9 +3,19 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+import regpath
 from regpath import HKeyNotFoundError, RegistryPath
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # earlier tests may have left mock handles in the cache... don't hand those
+    # to the real CloseKey
+    with patch("regpath.winreg.CloseKey"):
+        regpath.clear_handle_cache()
+    yield
+
+
 def test_init():
     with pytest.raises(ValueError):
         RegistryPath("")
@@ -83,7 +93,7 @@ def test_get_subkey_handle():
                 r"\\mycomputer", winreg.HKEY_LOCAL_MACHINE
             )
             OpenKey.assert_called_with(
-                ConnectRegistry().__enter__.return_value,
+                ConnectRegistry.return_value,
                 r"HARDWARE\Stuff",
                 access=winreg.KEY_READ,
             )
@@ -97,12 +107,63 @@ def test_get_subkey_handle():
 
             ConnectRegistry.assert_called_with(None, winreg.HKEY_LOCAL_MACHINE)
             OpenKey.assert_called_with(
-                ConnectRegistry().__enter__.return_value,
+                ConnectRegistry.return_value,
                 r"HARDWARE\Stuff",
                 access=winreg.KEY_READ | winreg.KEY_WRITE,
             )
 
 
+def test_get_subkey_handle_caches_handles():
+    p = RegistryPath("HKLM\\HARDWARE\\Stuff")
+    with patch("regpath.winreg.ConnectRegistry"):
+        with patch("regpath.winreg.OpenKey") as OpenKey:
+            with p._get_subkey_handle() as handle:
+                pass
+
+            with p._get_subkey_handle() as handle2:
+                pass
+
+    assert handle is handle2
+    assert OpenKey.call_count == 1
+
+
+def test_root_handles_cached():
+    with patch("regpath.winreg.ConnectRegistry") as ConnectRegistry:
+        with patch("regpath.winreg.OpenKey"):
+            RegistryPath("HKLM\\HARDWARE\\Stuff")._get_subkey_handle()
+            RegistryPath("HKLM\\SOFTWARE\\Else")._get_subkey_handle()
+
+    # two different subkeys... though one connection to the root
+    assert ConnectRegistry.call_count == 1
+
+
+def test_close():
+    p = RegistryPath("HKLM\\HARDWARE\\Stuff")
+    other = RegistryPath("HKLM\\HARDWARE\\OtherStuff")
+    with patch("regpath.winreg.ConnectRegistry"):
+        with patch("regpath.winreg.OpenKey"):
+            with p._get_subkey_handle() as read_handle:
+                pass
+
+            with p._get_subkey_handle(writes=True) as write_handle:
+                pass
+
+            with other._get_subkey_handle() as other_handle:
+                pass
+
+    with patch("regpath.winreg.CloseKey") as CloseKey:
+        p.close()
+
+    assert CloseKey.call_count == 2
+    CloseKey.assert_any_call(read_handle)
+    CloseKey.assert_any_call(write_handle)
+
+    with patch("regpath.winreg.CloseKey") as CloseKey:
+        regpath.clear_handle_cache()
+
+    CloseKey.assert_called_once_with(other_handle)
+
+
 def test_exists_key_true():
     p = RegistryPath("HKLM\\HARDWARE\\Stuff")
     p._get_subkey_handle = MagicMock()
@@ -136,6 +197,33 @@ def test_exists_value_false():
         QueryValueEx.assert_called_once_with("handle", "test")
 
 
+def test_exists_caches_probes():
+    p = RegistryPath("HKLM\\HARDWARE\\Stuff")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    assert p.exists()
+
+    # an equal path should get the cached answer without probing
+    p2 = RegistryPath("HKLM\\HARDWARE\\Stuff")
+    p2._get_subkey_handle = MagicMock(side_effect=AssertionError("should not probe"))
+    assert p2.exists()
+
+
+def test_probe_cache_invalidated_by_write():
+    p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    with patch("regpath.winreg.QueryValueEx", side_effect=FileNotFoundError):
+        assert not p.exists()
+
+    with patch("regpath.winreg.SetValueEx"):
+        p.write_raw(1, winreg.REG_DWORD)
+
+    # the write cleared the cached answer, so exists() probes again
+    with patch("regpath.winreg.QueryValueEx"):
+        assert p.exists()
+
+
 def test_is_dir():
     p = RegistryPath("HKLM\\HARDWARE\\Stuff")
     p.exists = MagicMock(return_value=True)
@@ -280,20 +368,72 @@ def test_iterdir():
     p.is_dir = MagicMock(return_value=True)
     p._get_subkey_handle = MagicMock()
     p._get_subkey_handle().__enter__.return_value = "handle"
-    with patch("regpath.winreg.QueryInfoKey", return_value=(3, 2, 0)) as QueryInfoKey:
-        with patch("regpath.winreg.EnumKey", lambda handle, idx: str(idx)):
-            with patch(
-                "regpath.winreg.EnumValue", lambda handle, idx: (str(idx), "", "")
-            ):
-                assert list(p.iterdir()) == [
-                    RegistryPath(r"HKLM\Other\Stuff\0"),
-                    RegistryPath(r"HKLM\Other\Stuff\1"),
-                    RegistryPath(r"HKLM\Other\Stuff\2"),
-                    RegistryPath(r"HKLM\Other\Stuff", value_name="0"),
-                    RegistryPath(r"HKLM\Other\Stuff", value_name="1"),
-                ]
-
-    QueryInfoKey.assert_called_once_with("handle")
+    with patch(
+        "regpath._enum_key_names", return_value=["0", "1", "2"]
+    ) as enum_key_names:
+        with patch(
+            "regpath._enum_value_names", return_value=["0", "1"]
+        ) as enum_value_names:
+            assert list(p.iterdir()) == [
+                RegistryPath(r"HKLM\Other\Stuff\0"),
+                RegistryPath(r"HKLM\Other\Stuff\1"),
+                RegistryPath(r"HKLM\Other\Stuff\2"),
+                RegistryPath(r"HKLM\Other\Stuff", value_name="0"),
+                RegistryPath(r"HKLM\Other\Stuff", value_name="1"),
+            ]
+
+    enum_key_names.assert_called_once_with("handle")
+    enum_value_names.assert_called_once_with("handle")
+
+
+def test_iterdir_with_values():
+    p = RegistryPath(r"HKLM\Other\Stuff")
+    p.is_dir = MagicMock(return_value=True)
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    p.read_many = MagicMock(return_value={"0": "a", "1": "b"})
+    with patch("regpath._enum_key_names", return_value=["0"]):
+        with patch("regpath._enum_value_names", return_value=["0", "1"]):
+            assert list(p.iterdir_with_values()) == [
+                (RegistryPath(r"HKLM\Other\Stuff\0"), None),
+                (RegistryPath(r"HKLM\Other\Stuff", value_name="0"), "a"),
+                (RegistryPath(r"HKLM\Other\Stuff", value_name="1"), "b"),
+            ]
+
+    p.read_many.assert_called_once_with(["0", "1"])
+
+
+def test_read_many():
+    p = RegistryPath(r"HKLM\Other\Stuff")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    raw_values = {
+        "a": ("hi\x00".encode("utf-16-le"), winreg.REG_SZ),
+        "b": ((5).to_bytes(4, "little"), winreg.REG_DWORD),
+    }
+    with patch(
+        "regpath._query_multiple_values", return_value=raw_values
+    ) as query_multiple_values:
+        assert p.read_many(["a", "b"]) == {"a": "hi", "b": 5}
+
+    query_multiple_values.assert_called_once_with("handle", ["a", "b"])
+
+
+@pytest.mark.parametrize(
+    "data, typ, expected",
+    [
+        ("hi\x00".encode("utf-16-le"), winreg.REG_SZ, "hi"),
+        ("%hi%\x00".encode("utf-16-le"), winreg.REG_EXPAND_SZ, "%hi%"),
+        ("a\x00b\x00\x00".encode("utf-16-le"), winreg.REG_MULTI_SZ, ["a", "b"]),
+        ((5).to_bytes(4, "little"), winreg.REG_DWORD, 5),
+        ((2**40).to_bytes(8, "little"), winreg.REG_QWORD, 2**40),
+        ((5).to_bytes(4, "big"), winreg.REG_DWORD_BIG_ENDIAN, 5),
+        (b"123", winreg.REG_BINARY, b"123"),
+        (b"", winreg.REG_BINARY, None),
+    ],
+)
+def test_reg_bytes_to_py(data, typ, expected):
+    assert regpath._reg_bytes_to_py(data, typ) == expected
 
 
 def test_unlink_not_a_file():
@@ -330,8 +470,8 @@ def test_unlink_file_not_found_missing_ok():
 def test_rmdir():
     p = RegistryPath(r"HKLM\Other\Stuff")
     p.iterdir = MagicMock(side_effect=StopIteration())
-    p._get_subkey_handle = MagicMock()
-    p._get_subkey_handle().__enter__.return_value = "handle"
+    p.parent._get_subkey_handle = MagicMock()
+    p.parent._get_subkey_handle().__enter__.return_value = "handle"
     with patch("regpath.winreg.DeleteKey") as DeleteKey:
         p.rmdir()
 
@@ -354,26 +494,78 @@ def test_rmdir_non_empty():
 
 def test_rmtree():
     p = RegistryPath(r"HKLM\Other\Stuff")
-    p.rmdir = MagicMock()
+    p.is_dir = MagicMock(return_value=True)
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    p.parent._get_subkey_handle = MagicMock()
+    p.parent._get_subkey_handle().__enter__.return_value = "parent_handle"
 
-    p1 = RegistryPath(r"HKLM\Other\Stuff\Inner")
-    p1.is_dir = lambda: True
-    p1.rmtree = MagicMock()
+    with patch("regpath._rmtree_with_handle") as rmtree_with_handle:
+        with patch("regpath.winreg.DeleteKey") as DeleteKey:
+            p.rmtree()
 
-    p2 = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
-    p2.is_dir = lambda: False
-    p2.unlink = MagicMock()
+    rmtree_with_handle.assert_called_once_with("handle")
+    DeleteKey.assert_called_once_with("parent_handle", "Stuff")
 
-    def iterdir():
-        for i in [p1, p2]:
-            yield i
 
-    p.iterdir = iterdir
+def test_rmtree_not_a_dir():
+    p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
+    with pytest.raises(NotADirectoryError):
+        p.rmtree()
+
+
+def test_rmtree_closes_descendant_handles():
+    # a previously-probed child leaves a handle in the cache
+    child = RegistryPath(r"HKLM\Other\Stuff\Inner")
+    with patch("regpath.winreg.ConnectRegistry"):
+        with patch("regpath.winreg.OpenKey"):
+            with child._get_subkey_handle() as child_handle:
+                pass
 
-    p.rmtree()
-    p1.rmtree.assert_called_once_with()
-    p2.unlink.assert_called_once_with()
-    p.rmdir.assert_called_once_with()
+    p = RegistryPath(r"HKLM\Other\Stuff")
+    p.is_dir = MagicMock(return_value=True)
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    p.parent._get_subkey_handle = MagicMock()
+    p.parent._get_subkey_handle().__enter__.return_value = "parent_handle"
+
+    with patch("regpath._rmtree_with_handle"):
+        with patch("regpath.winreg.DeleteKey"):
+            with patch("regpath.winreg.CloseKey") as CloseKey:
+                p.rmtree()
+
+    # the child's stale handle was evicted along with the subtree
+    CloseKey.assert_called_once_with(child_handle)
+
+
+def test_rmtree_with_handle():
+    # one (empty) subkey and one value under the top handle
+    key_names = ["Sub"]
+    value_names = ["v"]
+
+    def enum_key(handle, idx):
+        if handle == "handle" and key_names:
+            return key_names.pop(0)
+        raise OSError("no more items")
+
+    def enum_value(handle, idx):
+        if handle == "handle" and value_names:
+            return (value_names.pop(0), "", "")
+        raise OSError("no more items")
+
+    with patch("regpath.winreg.EnumKey", enum_key):
+        with patch("regpath.winreg.EnumValue", enum_value):
+            with patch("regpath.winreg.OpenKey") as OpenKey:
+                OpenKey.return_value.__enter__.return_value = "child_handle"
+                with patch("regpath.winreg.DeleteKey") as DeleteKey:
+                    with patch("regpath.winreg.DeleteValue") as DeleteValue:
+                        regpath._rmtree_with_handle("handle")
+
+    OpenKey.assert_called_once_with(
+        "handle", "Sub", access=winreg.KEY_READ | winreg.KEY_WRITE
+    )
+    DeleteKey.assert_called_once_with("handle", "Sub")
+    DeleteValue.assert_called_once_with("handle", "v")
 
 
 def test_with_value_name():
@@ -396,6 +588,17 @@ def test_read_raw():
     QueryValueEx.assert_called_once_with("handle", "v")
 
 
+def test_read_raw_default_value():
+    # the registry addresses a key's (Default) value via an empty string
+    p = RegistryPath(r"HKLM\Other\Stuff", value_name="")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    with patch("regpath.winreg.QueryValueEx", return_value=("abc", 1)) as QueryValueEx:
+        assert p.read_raw() == ("abc", 1)
+
+    QueryValueEx.assert_called_once_with("handle", "")
+
+
 def test_read():
     p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
     p.read_raw = MagicMock(return_value=(1, 2))
@@ -420,16 +623,28 @@ def test_write_raw():
 
 
 def test_write_no_guessing():
-    class RegistryPathWithRegistryType(RegistryPath):
-        registry_type = 3
+    p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+
+    with patch("regpath._query_value_type", return_value=3) as query_value_type:
+        with patch("regpath.winreg.SetValueEx") as SetValueEx:
+            p.write(1)
+
+    query_value_type.assert_called_once_with("handle", "v")
+    SetValueEx.assert_called_once_with("handle", "v", 0, 3, 1)
 
-    p = RegistryPathWithRegistryType(r"HKLM\Other\Stuff", value_name="v")
-    p.with_value_name = lambda x: p
-    p.write_raw = MagicMock()
 
-    p.write(1)
+def test_write_guesses_if_value_missing():
+    p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+
+    with patch("regpath._query_value_type", return_value=None):
+        with patch("regpath.winreg.SetValueEx") as SetValueEx:
+            p.write(1)
 
-    p.write_raw.assert_called_once_with(1, 3, "v")
+    SetValueEx.assert_called_once_with("handle", "v", 0, winreg.REG_DWORD, 1)
 
 
 @pytest.mark.parametrize(
@@ -439,6 +654,7 @@ def test_write_no_guessing():
         (0xFFFFFFFFFF, winreg.REG_QWORD),
         ("hello", winreg.REG_SZ),
         ("%hello%", winreg.REG_EXPAND_SZ),
+        ("50% off and another 20%", winreg.REG_SZ),
         (["hi", "world"], winreg.REG_MULTI_SZ),
         (None, winreg.REG_NONE),
         (b"123", winreg.REG_BINARY),
@@ -447,15 +663,28 @@ def test_write_no_guessing():
 def test_write_guessing(value, expected_type):
 
     p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
-    p.write_raw = MagicMock()
-    p.write(value, read_type=False)
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    with patch("regpath.winreg.SetValueEx") as SetValueEx:
+        p.write(value, read_type=False)
+
+    SetValueEx.assert_called_once_with("handle", "v", 0, expected_type, value)
+
+
+def test_write_many():
+    p = RegistryPath(r"HKLM\Other\Stuff")
+    p._get_subkey_handle = MagicMock()
+    p._get_subkey_handle().__enter__.return_value = "handle"
+    with patch("regpath.winreg.SetValueEx") as SetValueEx:
+        p.write_many({"a": 1, "b": "hello"})
 
-    p.write_raw.assert_called_once_with(value, expected_type, "v")
+    SetValueEx.assert_any_call("handle", "a", 0, winreg.REG_DWORD, 1)
+    SetValueEx.assert_any_call("handle", "b", 0, winreg.REG_SZ, "hello")
+    assert SetValueEx.call_count == 2
 
 
 def test_write_negative_number_error():
     p = RegistryPath(r"HKLM\Other\Stuff", value_name="v")
-    p.write_raw = MagicMock()
 
     with pytest.raises(ValueError):
         p.write(-1, read_type=False)